@@ -3,17 +3,137 @@ Confluence API Client
 Handles communication with Confluence REST API
 """
 import re
+import time
+import shutil
 import logging
+import threading
+from datetime import timedelta
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urlparse, urljoin
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional, fall back to the stdlib parser
+    import json
+    _json_loads = json.loads
+
+try:
+    from requests_cache import CachedSession, DO_NOT_CACHE
+except ImportError:  # requests-cache is only needed for persistent caching
+    CachedSession = None
+
 logger = logging.getLogger(__name__)
 
+# URL patterns used to identify spaces, folders and pages
+_SPACE_RE = re.compile(r'/spaces/([A-Z0-9_-]+)(?:/|$)', re.IGNORECASE)
+_FOLDER_RE = re.compile(r'/folder/(\d+)')
+_PAGEID_RE = re.compile(r'pageId=(\d+)')
+_PAGES_RE = re.compile(r'/pages/(\d+)')
+
+# Request rate limits, in requests per second. Requests start at Atlassian's
+# documented 500 requests per minute per user and adapt to throttling
+_INITIAL_RATE = 500 / 60
+_MIN_RATE = 1.0
+_MAX_RATE = 100.0
+
+
+class _RateLimiter:
+    """Thread-safe token bucket whose rate adapts to throttling (AIMD)"""
+    
+    def __init__(self, rate=_INITIAL_RATE, burst=10):
+        """
+        Initialize rate limiter
+        
+        Args:
+            rate: Initial number of requests allowed per second
+            burst: Maximum number of requests that may be issued back to back
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._decreased = None
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a request may be issued"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+    
+    def update(self, throttled):
+        """
+        Adjust the rate after a response
+        
+        Args:
+            throttled: Whether the server rate limited the request
+        """
+        with self._lock:
+            if throttled:
+                # Requests in flight when the limit is hit all come back throttled,
+                # so back off at most once per request interval
+                now = time.monotonic()
+                if self._decreased is not None and now - self._decreased < 1 / self.rate:
+                    return
+                self._decreased = now
+                # Back off quickly, and drop the tokens saved up for bursts
+                self.rate = max(_MIN_RATE, self.rate / 2)
+                self._tokens = min(self._tokens, 0)
+                logger.debug(f"Rate limited by Confluence, slowing down to {self.rate:.1f} requests/s")
+            else:
+                self.rate = min(_MAX_RATE, self.rate + 0.1)
+
+
+class _RateLimitedAdapter(HTTPAdapter):
+    """HTTP adapter that paces requests through a _RateLimiter"""
+    
+    def __init__(self, rate_limiter, **kwargs):
+        """
+        Initialize adapter
+        
+        Args:
+            rate_limiter: _RateLimiter shared by all requests of the session
+            **kwargs: Arguments passed on to HTTPAdapter
+        """
+        self.rate_limiter = rate_limiter
+        super().__init__(**kwargs)
+    
+    def send(self, request, **kwargs):
+        # Responses served from the response cache never get here, so only
+        # requests that actually reach the server are paced
+        self.rate_limiter.acquire()
+        try:
+            response = super().send(request, **kwargs)
+        except requests.exceptions.RetryError:
+            # Retries ran out, every attempt having been throttled or failed
+            self.rate_limiter.update(True)
+            raise
+        
+        # 429s retried by urllib3 are only visible in the retry history
+        retries = getattr(response.raw, 'retries', None)
+        throttled = response.status_code == 429 or any(
+            attempt.status == 429 for attempt in (retries.history if retries else ())
+        )
+        self.rate_limiter.update(throttled)
+        return response
+
 
 class ConfluenceClient:
     """Client for interacting with Confluence REST API"""
     
-    def __init__(self, page_url, username, api_token):
+    def __init__(self, page_url, username, api_token, page_size=100, cache_path=None, prefer_storage=False,
+                 max_connections=32):
         """
         Initialize Confluence client
         
@@ -21,22 +141,82 @@ class ConfluenceClient:
             page_url: Full URL to a Confluence page, folder, or space
             username: Confluence username (email)
             api_token: Confluence API token
+            page_size: Number of results requested per page from paginated endpoints
+            cache_path: Path of a persistent on-disk response cache (optional)
+            prefer_storage: Request only the storage format of page bodies instead of
+                the server-rendered view, which is much cheaper to produce and transfer
+            max_connections: Number of connections kept open to the Confluence host.
+                Should be at least the number of threads issuing requests at once
         """
         self.username = username
         self.api_token = api_token
         self.page_url = page_url
+        self.page_size = page_size
+        self.cache_path = cache_path
+        self.prefer_storage = prefer_storage
         
         # Parse the URL to get base URL and page/folder/space ID
         self.base_url, self.page_id, self.is_folder, self.is_space, self.space_key = self._parse_confluence_url(page_url)
         self.api_base = f"{self.base_url}/rest/api"
         
         # Setup session with authentication
-        self.session = requests.Session()
+        if cache_path:
+            if CachedSession is None:
+                raise RuntimeError("Response caching requires the requests-cache package (pip install requests-cache)")
+            # Listings (including attachment lists) are never cached so the tree
+            # and its version numbers are always current. Page content is
+            # refreshed as soon as the page's version changes, and at least once
+            # a day, since the rendered view can include other content and
+            # changes to it don't bump the page's version
+            self.session = CachedSession(
+                cache_path,
+                backend='sqlite',
+                expire_after=timedelta(days=1),
+                allowable_methods=['GET'],
+                urls_expire_after={
+                    '*/child/*': DO_NOT_CACHE,
+                    '*/space/*': DO_NOT_CACHE,
+                    # Attachments are streamed straight to disk instead
+                    '*/download/*': DO_NOT_CACHE
+                }
+            )
+        else:
+            self.session = requests.Session()
         self.session.auth = (username, api_token)
         self.session.headers.update({
             'Accept': 'application/json',
             'Content-Type': 'application/json'
         })
+        
+        # Keep enough pooled connections for concurrent requests, so connections
+        # (and their TLS sessions) are reused rather than opened and dropped, and
+        # retry transient failures (rate limiting, 5xx) instead of aborting the export.
+        # Requests are paced to stay under Confluence's rate limit, slowing down
+        # whenever it is hit
+        retry = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True
+        )
+        adapter = _RateLimitedAdapter(
+            _RateLimiter(),
+            pool_connections=max_connections,
+            pool_maxsize=max_connections,
+            max_retries=retry
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # Thread pool used to fetch sibling subtrees concurrently
+        self._pool = ThreadPoolExecutor(max_workers=16)
+        
+        # Content info responses keyed by (content_id, expand)
+        self._info_cache = {}
+        
+        # Pages whose cached responses were found to be out of date
+        self._stale_ids = set()
     
     def _parse_confluence_url(self, url):
         """
@@ -65,7 +245,7 @@ class ConfluenceClient:
         
         # Check if it's a space URL (must check before checking for folders/pages)
         # Match patterns like /wiki/spaces/SPACEKEY or /spaces/SPACEKEY
-        space_match = re.search(r'/spaces/([A-Z0-9_-]+)(?:/|$)', url, re.IGNORECASE)
+        space_match = _SPACE_RE.search(url)
         if space_match and not ('/pages/' in url or '/folder/' in url):
             space_key = space_match.group(1)
             is_space = True
@@ -74,18 +254,18 @@ class ConfluenceClient:
         
         # Check if it's a folder URL
         if '/folder/' in url:
-            match = re.search(r'/folder/(\d+)', url)
+            match = _FOLDER_RE.search(url)
             if match:
                 page_id = match.group(1)
                 is_folder = True
         # Try to find pageId parameter
         elif 'pageId=' in url:
-            match = re.search(r'pageId=(\d+)', url)
+            match = _PAGEID_RE.search(url)
             if match:
                 page_id = match.group(1)
         # Try to find page ID in path
         elif '/pages/' in url:
-            match = re.search(r'/pages/(\d+)', url)
+            match = _PAGES_RE.search(url)
             if match:
                 page_id = match.group(1)
         
@@ -102,21 +282,47 @@ class ConfluenceClient:
         
         return base_url, page_id, is_folder, is_space, space_key
     
-    def _make_request(self, endpoint, params=None):
+    def _make_request(self, endpoint, params=None, refresh=False, cache=True):
         """
         Make authenticated request to Confluence API
         
         Args:
             endpoint: API endpoint path
             params: Query parameters
+            refresh: Bypass the response cache and store a fresh response
+            cache: Whether the response cache is used at all. Responses that must
+                always be current are neither read from it nor stored in it
             
         Returns:
             dict: JSON response
         """
         url = urljoin(self.api_base, endpoint)
-        response = self.session.get(url, params=params)
+        if not cache and self.cache_path:
+            response = self.session.get(url, params=params, expire_after=DO_NOT_CACHE)
+        elif refresh and self.cache_path:
+            response = self.session.get(url, params=params, force_refresh=True)
+        else:
+            response = self.session.get(url, params=params)
         response.raise_for_status()
-        return response.json()
+        return _json_loads(response.content)
+    
+    def _map_concurrently(self, func, items):
+        """
+        Apply a function to each item on the client's thread pool
+        
+        Must not be called from inside the pool itself, so tree walks are done
+        level by level rather than by recursive submission.
+        
+        Args:
+            func: Function taking a single item
+            items: Items to process
+            
+        Returns:
+            list: Results in the same order as items
+        """
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        return list(self._pool.map(func, items))
     
     def get_page_info(self):
         """
@@ -125,28 +331,53 @@ class ConfluenceClient:
         Returns:
             dict: Page information including id, title, space
         """
-        endpoint = f"/wiki/rest/api/content/{self.page_id}"
-        params = {
-            'expand': 'space,version,body.storage'
-        }
-        return self._make_request(endpoint, params)
+        return self._get_cached_content(self.page_id, 'space,version,body.storage')
     
-    def get_page_content(self, page_id):
+    def get_page_content(self, page_id, body_format=None):
         """
         Get full HTML content of a page
         
         Args:
             page_id: Confluence page ID
+            body_format: 'view' for the rendered page or 'storage' for the raw
+                storage format (defaults to the client's prefer_storage setting)
             
         Returns:
             str: HTML content of the page
         """
         endpoint = f"/wiki/rest/api/content/{page_id}"
         params = {
-            'expand': 'body.storage,body.view'
+            'expand': self._body_expand(body_format)
         }
-        page_data = self._make_request(endpoint, params)
+        page_data = self._make_request(endpoint, params, refresh=page_id in self._stale_ids)
+        return self._extract_body(page_data)
+    
+    def _body_expand(self, body_format=None):
+        """
+        Get the body properties to expand for a page body format
+        
+        Args:
+            body_format: 'view', 'storage' or None for the client default
+            
+        Returns:
+            str: Comma-separated body expansions
+        """
+        if body_format is None:
+            body_format = 'storage' if self.prefer_storage else 'view'
+        if body_format == 'storage':
+            return 'body.storage'
+        return 'body.storage,body.view'
+    
+    def _extract_body(self, page_data):
+        """
+        Extract the HTML body from a content response
         
+        Args:
+            page_data: Content dictionary with body expanded
+            
+        Returns:
+            str: HTML content of the page
+        """
         # Try to get the rendered view first, fallback to storage format
         if 'body' in page_data:
             if 'view' in page_data['body']:
@@ -156,6 +387,61 @@ class ConfluenceClient:
         
         return ""
     
+    def get_page_bundle(self, page_id, version_number=None):
+        """
+        Get content, contributors and attachments of a page in a single request
+        
+        Args:
+            page_id: Confluence page ID
+            version_number: Current version number of the page, used to detect
+                out-of-date cached responses (optional)
+            
+        Returns:
+            tuple: (page_content, contributors, attachments). contributors or
+                attachments is None when the response didn't include them in
+                full, in which case get_page_properties / get_page_attachments
+                should be used instead.
+        """
+        endpoint = f"/wiki/rest/api/content/{page_id}"
+        expand = f'{self._body_expand()},history.createdBy,history.contributors.publishers,version.by'
+        # Adding or replacing an attachment doesn't change the page's version,
+        # so with the response cache attachments are listed through the
+        # (uncached) attachments endpoint instead
+        if not self.cache_path:
+            expand += ',children.attachment.version'
+        params = {
+            'expand': expand
+        }
+        page_data = self._make_request(endpoint, params)
+        
+        # A cached copy of an older version means the page has been edited since
+        if self.cache_path and version_number is not None:
+            if page_data.get('version', {}).get('number') != version_number:
+                logger.debug(f"Cached content for page ID {page_id} is out of date, refreshing")
+                self._stale_ids.add(page_id)
+                page_data = self._make_request(endpoint, params, refresh=True)
+        
+        page_content = self._extract_body(page_data)
+        
+        contributors = None
+        history = page_data.get('history', {})
+        publishers = history.get('contributors', {}).get('publishers', {})
+        if 'users' in publishers:
+            contributors = self._collect_contributors(
+                publishers['users'],
+                history.get('createdBy'),
+                page_data.get('version', {}).get('by')
+            )
+        
+        # Expanded children are truncated to the first page of results, and
+        # only a short page is known to hold all of them
+        attachments = None
+        attachment_data = page_data.get('children', {}).get('attachment')
+        if attachment_data is not None and len(attachment_data.get('results', [])) < attachment_data.get('limit', 0):
+            attachments = attachment_data['results']
+        
+        return page_content, contributors, attachments
+    
     def get_version_history(self, page_id):
         """
         Get full version history for a page
@@ -170,17 +456,18 @@ class ConfluenceClient:
         
         try:
             start = 0
-            limit = 100
+            limit = self.page_size
+            
+            endpoint = f"/wiki/rest/api/content/{page_id}/version"
+            params = {
+                'limit': limit,
+                'start': start,
+                'expand': 'by'
+            }
             
             while True:
-                endpoint = f"/wiki/rest/api/content/{page_id}/version"
-                params = {
-                    'limit': limit,
-                    'start': start,
-                    'expand': 'by'
-                }
-                
-                response = self._make_request(endpoint, params)
+                params['start'] = start
+                response = self._make_request(endpoint, params, refresh=page_id in self._stale_ids)
                 results = response.get('results', [])
                 
                 for version in results:
@@ -192,114 +479,63 @@ class ConfluenceClient:
                     }
                     versions.append(version_info)
                 
-                # Check if there are more versions
-                if len(results) < limit:
+                # Check if there are more versions (the server may return fewer per page
+                # than requested, so its own limit is compared)
+                if not results or len(results) < response.get('limit', limit):
                     break
                 
-                start += limit
+                start += len(results)
             
         except Exception as e:
             logger.debug(f"Could not retrieve version history: {str(e)}")
         
         return versions
     
-    def get_page_properties(self, page_id):
+    def get_page_properties(self, page_id, version_number=None):
         """
         Get page properties including all contributors from version history
         
         Args:
             page_id: Confluence page ID
+            version_number: Current version number of the page, if already known (optional)
             
         Returns:
             dict: Page properties including contributors list with displayName and profilePicture
         """
         all_properties = {}
-        contributors = {}  # Use dict to track unique contributors by accountId
         
         try:
-            # Get version history to collect all contributors
-            start = 0
-            limit = 25
-            
-            while True:
+            # Get version history to collect all contributors. A page that was
+            # never edited has only its creator as contributor, which the
+            # content endpoint below already returns
+            users = []
+            if version_number != 1:
+                # The history endpoint returns a single history object, not a paginated list
                 endpoint = f"/wiki/rest/api/content/{page_id}/history"
                 params = {
-                    'limit': limit,
-                    'start': start,
                     'expand': 'contributors.publishers'
                 }
+                history_data = self._make_request(endpoint, params, refresh=page_id in self._stale_ids)
                 
-                history_data = self._make_request(endpoint, params)
-                
-                # Process contributors from this batch
-                if 'contributors' in history_data:
-                    # Get publishers (users who edited the page)
-                    if 'publishers' in history_data['contributors']:
-                        publishers = history_data['contributors']['publishers']
-                        if 'users' in publishers:
-                            for user in publishers['users']:
-                                account_id = user.get('accountId', user.get('username', ''))
-                                if account_id and account_id not in contributors:
-                                    contributor_info = {
-                                        'displayName': user.get('displayName', user.get('username', 'Unknown')),
-                                        'accountId': account_id
-                                    }
-                                    
-                                    # Get profile picture if available
-                                    if 'profilePicture' in user:
-                                        contributor_info['profilePicture'] = user['profilePicture'].get('path', '')
-                                    
-                                    contributors[account_id] = contributor_info
-                                    logger.debug(f"Contributor: {contributor_info['displayName']}")
-                
-                # Check if we've processed all history
-                # The history endpoint doesn't return a paginated list in the same way
-                # It returns a single history object, not a results array
-                break
+                # Get publishers (users who edited the page)
+                publishers = history_data.get('contributors', {}).get('publishers', {})
+                users.extend(publishers.get('users', []))
             
-            # Also get the page creator from the main content endpoint
+            # Also get the page creator and last modifier from the main content endpoint
+            creator = None
+            modifier = None
             try:
                 endpoint = f"/wiki/rest/api/content/{page_id}"
                 params = {
                     'expand': 'history.createdBy,version.by'
                 }
-                page_data = self._make_request(endpoint, params)
-                
-                # Add creator
-                if 'history' in page_data and 'createdBy' in page_data['history']:
-                    creator = page_data['history']['createdBy']
-                    account_id = creator.get('accountId', creator.get('username', ''))
-                    if account_id and account_id not in contributors:
-                        contributor_info = {
-                            'displayName': creator.get('displayName', creator.get('username', 'Unknown')),
-                            'accountId': account_id,
-                            'isCreator': True
-                        }
-                        if 'profilePicture' in creator:
-                            contributor_info['profilePicture'] = creator['profilePicture'].get('path', '')
-                        contributors[account_id] = contributor_info
-                        logger.debug(f"Creator: {contributor_info['displayName']}")
-                
-                # Add last modifier
-                if 'version' in page_data and 'by' in page_data['version']:
-                    modifier = page_data['version']['by']
-                    account_id = modifier.get('accountId', modifier.get('username', ''))
-                    if account_id and account_id not in contributors:
-                        contributor_info = {
-                            'displayName': modifier.get('displayName', modifier.get('username', 'Unknown')),
-                            'accountId': account_id
-                        }
-                        if 'profilePicture' in modifier:
-                            contributor_info['profilePicture'] = modifier['profilePicture'].get('path', '')
-                        contributors[account_id] = contributor_info
-                        logger.debug(f"Last modifier: {contributor_info['displayName']}")
+                page_data = self._make_request(endpoint, params, refresh=page_id in self._stale_ids)
+                creator = page_data.get('history', {}).get('createdBy')
+                modifier = page_data.get('version', {}).get('by')
             except Exception as e:
                 logger.debug(f"Could not retrieve creator/modifier info: {str(e)}")
             
-            # Convert contributors dict to list
-            all_properties['contributors'] = list(contributors.values())
-            logger.debug(f"Total unique contributors: {len(contributors)}")
-            logger.debug(f"Contributors: {[c['displayName'] for c in all_properties['contributors']]}")
+            all_properties['contributors'] = self._collect_contributors(users, creator, modifier)
                 
         except Exception as e:
             logger.debug(f"Could not retrieve page history: {str(e)}")
@@ -307,6 +543,53 @@ class ConfluenceClient:
         
         return all_properties
     
+    def _collect_contributors(self, users, creator=None, modifier=None):
+        """
+        Build a de-duplicated contributors list
+        
+        Args:
+            users: List of user dictionaries who edited the page
+            creator: User dictionary of the page creator (optional)
+            modifier: User dictionary of the last modifier (optional)
+            
+        Returns:
+            list: Contributor dictionaries with displayName, accountId and optional profilePicture/isCreator
+        """
+        seen = set()  # accountIds already added, to keep contributors unique
+        contributors = []
+        log_lines = []
+        
+        def add(user, label, is_creator=False):
+            account_id = user.get('accountId', user.get('username', ''))
+            if account_id and account_id not in seen:
+                seen.add(account_id)
+                contributor_info = {
+                    'displayName': user.get('displayName', user.get('username', 'Unknown')),
+                    'accountId': account_id
+                }
+                if is_creator:
+                    contributor_info['isCreator'] = True
+                
+                # Get profile picture if available
+                if 'profilePicture' in user:
+                    contributor_info['profilePicture'] = user['profilePicture'].get('path', '')
+                
+                contributors.append(contributor_info)
+                log_lines.append(f"{label}: {contributor_info['displayName']}")
+        
+        for user in users:
+            add(user, 'Contributor')
+        if creator:
+            add(creator, 'Creator', is_creator=True)
+        if modifier:
+            add(modifier, 'Last modifier')
+        
+        # Emit a single record per page rather than one per contributor
+        if log_lines:
+            logger.debug(f"Total unique contributors: {len(contributors)}\n  " + "\n  ".join(log_lines))
+        
+        return contributors
+    
     def get_child_pages(self, page_id):
         """
         Get all child pages of a given page
@@ -317,36 +600,63 @@ class ConfluenceClient:
         Returns:
             list: List of child page dictionaries
         """
+        # Fetch one level of the tree at a time, all siblings in parallel
+        children_by_parent = {}
+        level = [page_id]
+        while level:
+            results = self._map_concurrently(self._get_direct_child_pages, level)
+            next_level = []
+            for parent_id, children in zip(level, results):
+                children_by_parent[parent_id] = children
+                next_level.extend(child['id'] for child in children)
+            level = next_level
+        
+        # Flatten depth-first so each child is followed by its descendants
+        all_descendants = []
+        
+        def collect(parent_id):
+            for child in children_by_parent.get(parent_id, []):
+                all_descendants.append(child)
+                collect(child['id'])
+        
+        collect(page_id)
+        return all_descendants
+    
+    def _get_direct_child_pages(self, page_id):
+        """
+        Get the immediate child pages of a given page
+        
+        Args:
+            page_id: Parent page ID
+            
+        Returns:
+            list: List of child page dictionaries (not recursive)
+        """
         all_children = []
         start = 0
-        limit = 25
+        limit = self.page_size
+        
+        endpoint = f"/wiki/rest/api/content/{page_id}/child/page"
+        params = {
+            'expand': 'version',
+            'limit': limit,
+            'start': start
+        }
         
         while True:
-            endpoint = f"/wiki/rest/api/content/{page_id}/child/page"
-            params = {
-                'expand': 'version',
-                'limit': limit,
-                'start': start
-            }
-            
+            params['start'] = start
             response = self._make_request(endpoint, params)
             results = response.get('results', [])
             all_children.extend(results)
             
-            # Check if there are more pages
-            if len(results) < limit:
+            # Check if there are more pages (the server may return fewer per page
+            # than requested, so its own limit is compared)
+            if not results or len(results) < response.get('limit', limit):
                 break
             
-            start += limit
+            start += len(results)
         
-        # Recursively get children of children
-        all_descendants = []
-        for child in all_children:
-            all_descendants.append(child)
-            grandchildren = self.get_child_pages(child['id'])
-            all_descendants.extend(grandchildren)
-        
-        return all_descendants
+        return all_children
     
     def get_pages_in_folder(self, folder_id):
         """
@@ -358,25 +668,89 @@ class ConfluenceClient:
         Returns:
             list: List of all page dictionaries in the folder hierarchy
         """
-        all_pages = []
+        return [page for page, _ in self._walk(folder_id)]
+    
+    def _get_folder_tree(self, folder_id):
+        """
+        Get the pages and subfolders of a folder and all its descendants
         
-        # Get direct pages in this folder
-        pages = self._get_folder_contents(folder_id, 'page')
-        all_pages.extend(pages)
+        Args:
+            folder_id: Root folder (or page) ID
+            
+        Returns:
+            dict: Mapping of folder ID to a (pages, subfolders) tuple
+        """
+        folder_tree = {}
+        level = [folder_id]
+        while level:
+            results = self._map_concurrently(self._get_folder_children, level)
+            next_level = []
+            for current_id, (pages, subfolders) in zip(level, results):
+                folder_tree[current_id] = (pages, subfolders)
+                next_level.extend(sf['id'] for sf in subfolders if sf['id'] not in folder_tree)
+            level = next_level
+        return folder_tree
+    
+    def _get_folder_children(self, folder_id):
+        """
+        Get the direct pages and subfolders of a folder
         
-        # Get subfolders
-        subfolders = self._get_folder_contents(folder_id, 'folder')
-        logger.debug(f"Found {len(subfolders)} subfolder(s) in folder ID {folder_id}")
-        for sf in subfolders:
-            logger.debug(f"Subfolder: {sf.get('title', 'Unnamed')} (ID: {sf.get('id')})")
+        Args:
+            folder_id: Folder ID
+            
+        Returns:
+            tuple: (pages, subfolders)
+        """
+        children = self._get_all_children(folder_id)
+        pages = children['pages']
+        subfolders = children['folders']
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Found {len(subfolders)} subfolder(s) in folder ID {folder_id}" + "".join(
+                f"\n  Subfolder: {sf.get('title', 'Unnamed')} (ID: {sf.get('id')})" for sf in subfolders
+            ))
+        return pages, subfolders
         
-        # Recursively get pages from subfolders
-        for subfolder in subfolders:
-            subfolder_pages = self.get_pages_in_folder(subfolder['id'])
-            all_pages.extend(subfolder_pages)
+    def _get_all_children(self, content_id):
+        """
+        Get the direct child pages and child folders of a page or folder
+        
+        Both are expanded on the content itself so a single request usually
+        suffices. Expanded children are truncated to the first page of results,
+        so anything with more children is listed through the child endpoints.
+        
+        Args:
+            content_id: Page or folder ID
+        
+        Returns:
+            dict: {'pages': [...], 'folders': [...]}
+        """
+        endpoint = f"/wiki/rest/api/content/{content_id}"
+        params = {
+            'expand': 'children.page.version,children.folder.version'
+        }
+        try:
+            # Listings must be current, so this skips the response cache entirely
+            expanded = self._make_request(endpoint, params, cache=False).get('children', {})
+        except Exception as e:
+            logger.debug(f"Could not expand children of content ID {content_id}: {str(e)}")
+            expanded = {}
+        
+        children = {}
+        for content_type in ('page', 'folder'):
+            # Expanded children are truncated to the first page of results, and
+            # only a short page is known to hold all of them
+            data = expanded.get(content_type)
+            if data is not None and len(data.get('results', [])) < data.get('limit', 0):
+                children[f'{content_type}s'] = data['results']
+                continue
+            # Failing to list one type must not lose the other
+            try:
+                children[f'{content_type}s'] = self._get_folder_contents(content_id, content_type)
+            except Exception as e:
+                logger.debug(f"Could not fetch child {content_type}s of content ID {content_id}: {str(e)}")
+                children[f'{content_type}s'] = []
+        return children
         
-        return all_pages
-    
     def _get_folder_contents(self, folder_id, content_type='page'):
         """
         Get contents of a folder (pages or subfolders)
@@ -390,26 +764,28 @@ class ConfluenceClient:
         """
         all_items = []
         start = 0
-        limit = 25
+        limit = self.page_size
+        
+        endpoint = f"/wiki/rest/api/content/{folder_id}/child/{content_type}"
+        params = {
+            'expand': 'version',
+            'limit': limit,
+            'start': start
+        }
         
         while True:
-            endpoint = f"/wiki/rest/api/content/{folder_id}/child/{content_type}"
-            params = {
-                'expand': 'version',
-                'limit': limit,
-                'start': start
-            }
-            
+            params['start'] = start
             try:
                 response = self._make_request(endpoint, params)
                 results = response.get('results', [])
                 all_items.extend(results)
                 
-                # Check if there are more items
-                if len(results) < limit:
+                # Check if there are more items (the server may return fewer per page
+                # than requested, so its own limit is compared)
+                if not results or len(results) < response.get('limit', limit):
                     break
                 
-                start += limit
+                start += len(results)
             except requests.exceptions.HTTPError as e:
                 # If we get a 404, the folder might not have this content type
                 if e.response.status_code == 404:
@@ -425,11 +801,7 @@ class ConfluenceClient:
         Returns:
             dict: Folder information
         """
-        endpoint = f"/wiki/rest/api/content/{self.page_id}"
-        params = {
-            'expand': 'space,version'
-        }
-        return self._make_request(endpoint, params)
+        return self._get_cached_content(self.page_id, 'space,version')
     
     def get_page_attachments(self, page_id):
         """
@@ -443,26 +815,28 @@ class ConfluenceClient:
         """
         all_attachments = []
         start = 0
-        limit = 25
+        limit = self.page_size
+        
+        endpoint = f"/wiki/rest/api/content/{page_id}/child/attachment"
+        params = {
+            'expand': 'version',
+            'limit': limit,
+            'start': start
+        }
         
         while True:
-            endpoint = f"/wiki/rest/api/content/{page_id}/child/attachment"
-            params = {
-                'expand': 'version',
-                'limit': limit,
-                'start': start
-            }
-            
+            params['start'] = start
             try:
                 response = self._make_request(endpoint, params)
                 results = response.get('results', [])
                 all_attachments.extend(results)
                 
-                # Check if there are more attachments
-                if len(results) < limit:
+                # Check if there are more attachments (the server may return fewer per page
+                # than requested, so its own limit is compared)
+                if not results or len(results) < response.get('limit', limit):
                     break
                 
-                start += limit
+                start += len(results)
             except requests.exceptions.HTTPError as e:
                 # If we get a 404, the page might not have attachments
                 if e.response.status_code == 404:
@@ -494,15 +868,15 @@ class ConfluenceClient:
             if not download_url.startswith('http'):
                 download_url = urljoin(self.base_url, download_url)
             logger.debug(f"Absolute Download URL: {download_url}")
-            # Download the file
-            response = self.session.get(download_url, stream=True)
-            response.raise_for_status()
-            
-            # Save to file
-            with open(output_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            # Download the file. The response is closed even if the download
+            # fails, so its connection goes straight back to the shared pool
+            with self.session.get(download_url, stream=True) as response:
+                response.raise_for_status()
+                
+                # Save to file, copying in 1 MB blocks without a Python-level loop
+                response.raw.decode_content = True
+                with open(output_path, 'wb') as f:
+                    shutil.copyfileobj(response.raw, f, length=1024 * 1024)
             
             return True
         except requests.exceptions.HTTPError as e:
@@ -512,40 +886,66 @@ class ConfluenceClient:
             logger.warning(f"Error downloading attachment: {str(e)}")
             return False
     
+    def download_attachments(self, downloads):
+        """
+        Download several attachments concurrently
+        
+        Args:
+            downloads: List of (attachment, output_path) tuples
+            
+        Returns:
+            list: True/False per download, in the same order as downloads
+        """
+        return self._map_concurrently(lambda item: self.download_attachment(*item), downloads)
+    
     def get_pages_in_folder_with_structure(self, folder_id, parent_path=''):
         """
         Get all pages within a folder and its subfolders with path information
         
         Args:
             folder_id: Folder ID
-            parent_path: Path to parent folder (for recursion)
+            parent_path: Path to parent folder
             
         Returns:
             list: List of tuples (page_dict, relative_path)
         """
-        all_pages = []
-        
         # Get folder info to build path
         try:
             folder_info = self._get_content_info(folder_id)
             folder_name = folder_info.get('title', f'folder_{folder_id}')
             current_path = f"{parent_path}/{folder_name}" if parent_path else folder_name
-        except:
+        except Exception:
             current_path = parent_path if parent_path else ''
         
-        # Get direct pages in this folder
-        pages = self._get_folder_contents(folder_id, 'page')
-        for page in pages:
-            all_pages.append((page, current_path))
+        return self._walk(folder_id, current_path)
+    
+    def _walk(self, node_id, path=''):
+        """
+        Walk a page or folder and all its subfolders, visiting each node once
+        
+        Pages directly under a node get the node's path; each subfolder adds its
+        title (taken from the parent's listing) as a new path component.
         
-        # Get subfolders
-        subfolders = self._get_folder_contents(folder_id, 'folder')
+        Args:
+            node_id: ID of the page or folder to start from
+            path: Relative path of the starting node
+            
+        Returns:
+            list: List of tuples (page_dict, relative_path)
+        """
+        folder_tree = self._get_folder_tree(node_id)
+        all_pages = []
         
-        # Recursively get pages from subfolders
-        for subfolder in subfolders:
-            subfolder_pages = self.get_pages_in_folder_with_structure(subfolder['id'], current_path)
-            all_pages.extend(subfolder_pages)
+        def collect(current_id, current_path):
+            pages, subfolders = folder_tree[current_id]
+            for page in pages:
+                all_pages.append((page, current_path))
+            for subfolder in subfolders:
+                subfolder_name = subfolder.get('title', f'folder_{subfolder["id"]}')
+                subfolder_path = f"{current_path}/{subfolder_name}" if current_path else subfolder_name
+                collect(subfolder['id'], subfolder_path)
         
+        collect(node_id, path)
         return all_pages
     
     def _get_content_info(self, content_id):
@@ -558,11 +958,32 @@ class ConfluenceClient:
         Returns:
             dict: Content information
         """
+        return self._get_cached_content(content_id, 'version')
+    
+    def _get_cached_content(self, content_id, expand):
+        """
+        Get content by ID, reusing earlier responses for the same expansion
+        
+        Args:
+            content_id: Content ID
+            expand: Comma-separated list of properties to expand
+            
+        Returns:
+            dict: Content information
+        """
+        cache_key = (content_id, expand)
+        if cache_key in self._info_cache:
+            return self._info_cache[cache_key]
+        
+        # Content looked up by ID is where version numbers come from when a
+        # listing doesn't provide them, so it skips the response cache entirely
         endpoint = f"/wiki/rest/api/content/{content_id}"
         params = {
-            'expand': 'version'
+            'expand': expand
         }
-        return self._make_request(endpoint, params)
+        data = self._make_request(endpoint, params, cache=False)
+        self._info_cache[cache_key] = data
+        return data
     
     def get_child_pages_and_folders_with_structure(self, page_id, parent_path=''):
         """
@@ -570,31 +991,12 @@ class ConfluenceClient:
         
         Args:
             page_id: Parent page ID
-            parent_path: Path to parent (for recursion)
+            parent_path: Path to parent
             
         Returns:
             list: List of tuples (page_dict, relative_path)
         """
-        all_pages = []
-        
-        # Get direct child pages
-        child_pages = self._get_folder_contents(page_id, 'page')
-        for page in child_pages:
-            all_pages.append((page, parent_path))
-        
-        # Get child folders
-        child_folders = self._get_folder_contents(page_id, 'folder')
-        
-        # Recursively get pages from child folders
-        for folder in child_folders:
-            folder_name = folder.get('title', f'folder_{folder["id"]}')
-            folder_path = f"{parent_path}/{folder_name}" if parent_path else folder_name
-            
-            # Get pages in this folder and its subfolders
-            folder_pages = self.get_pages_in_folder_with_structure(folder['id'], parent_path)
-            all_pages.extend(folder_pages)
-        
-        return all_pages
+        return self._walk(page_id, parent_path)
     
     def get_space_info(self, space_key):
         """
@@ -624,16 +1026,17 @@ class ConfluenceClient:
         """
         all_content = []
         start = 0
-        limit = 25
+        limit = self.page_size
+        
+        endpoint = f"/wiki/rest/api/space/{space_key}/content?depth=root"
+        params = {
+            'limit': limit,
+            'start': start,
+            'expand': 'version'
+        }
         
         while True:
-            endpoint = f"/wiki/rest/api/space/{space_key}/content?depth=root"
-            params = {
-                'limit': limit,
-                'start': start,
-                'expand': 'version'
-            }
-            
+            params['start'] = start
             response = self._make_request(endpoint, params)
             
             # The response contains 'page' key with results
@@ -641,11 +1044,12 @@ class ConfluenceClient:
                 results = response['page']['results']
                 all_content.extend(results)
                 
-                # Check if there are more pages
-                if len(results) < limit:
+                # Check if there are more pages (the server may return fewer per page
+                # than requested, so its own limit is compared)
+                if not results or len(results) < response['page'].get('limit', limit):
                     break
                 
-                start += limit
+                start += len(results)
             else:
                 break
         
@@ -5,7 +5,11 @@ Downloads all pages from a Confluence space, folder, or page URL and exports the
 import os
 import sys
 import logging
+import queue
 import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from confluence_client import ConfluenceClient
 from pdf_exporter import PDFExporter
@@ -21,10 +25,128 @@ def setup_logging(debug=False):
     )
 
 
+def fetch_children(confluence, content_id, content_dict):
+    """
+    Fetch the child pages and child folders of a page or folder
+    
+    Args:
+        confluence: ConfluenceClient instance
+        content_id: Page or folder ID
+        content_dict: Content dictionary, or None if it still needs to be fetched
+        
+    Returns:
+        tuple: (content_dict, child_pages, child_folders). content_dict is None
+            if the content itself could not be fetched.
+    """
+    logger = logging.getLogger(__name__)
+    
+    # Fetch content info if we don't have it
+    if content_dict is None:
+        try:
+            content_dict = confluence._get_content_info(content_id)
+        except Exception as e:
+            logger.warning(f"Could not fetch info for content ID {content_id}: {str(e)}")
+            return None, [], []
+    
+    # Get child pages and folders
+    try:
+        children = confluence._get_all_children(content_id)
+    except Exception as e:
+        logger.debug(f"Could not fetch children of content ID {content_id}: {str(e)}")
+        return content_dict, [], []
+    
+    return content_dict, children['pages'], children['folders']
+
+
+def fetch_contributors(confluence, page):
+    """
+    Fetch the contributors of a page from the page properties endpoints
+    
+    Args:
+        confluence: ConfluenceClient instance
+        page: Page dictionary from discovery
+        
+    Returns:
+        list: Contributor dictionaries (empty if they could not be fetched)
+    """
+    logger = logging.getLogger(__name__)
+    
+    try:
+        properties = confluence.get_page_properties(page['id'], page.get('version', {}).get('number'))
+        # Extract contributors list from properties
+        return properties.get('contributors', [])
+    except Exception as e:
+        logger.debug(f"Could not fetch contributors: {str(e)}")
+        return []
+
+
+def fetch_attachments(confluence, page):
+    """
+    Fetch the attachments of a page from the attachments endpoint
+    
+    Args:
+        confluence: ConfluenceClient instance
+        page: Page dictionary from discovery
+        
+    Returns:
+        list: Attachment dictionaries (empty if they could not be fetched)
+    """
+    logger = logging.getLogger(__name__)
+    
+    try:
+        return confluence.get_page_attachments(page['id'])
+    except Exception as e:
+        logger.debug(f"Could not fetch attachments: {str(e)}")
+        return []
+
+
+def fetch_page_details(confluence, page):
+    """
+    Fetch content, contributors and attachments for a page
+    
+    Args:
+        confluence: ConfluenceClient instance
+        page: Page dictionary from discovery
+        
+    Returns:
+        tuple: (page_content, contributors, attachments)
+    """
+    logger = logging.getLogger(__name__)
+    
+    # Get page content, contributors and attachments in one request
+    page_content, contributors, attachments = confluence.get_page_bundle(
+        page['id'], page.get('version', {}).get('number')
+    )
+    
+    # Fall back to the dedicated endpoints for anything the bundle didn't
+    # include, issuing those requests concurrently
+    fallbacks = []
+    if contributors is None:
+        fallbacks.append(fetch_contributors)
+    if attachments is None:
+        fallbacks.append(fetch_attachments)
+    results = dict(zip(fallbacks, confluence._map_concurrently(lambda fetch: fetch(confluence, page), fallbacks)))
+    contributors = results.get(fetch_contributors, contributors)
+    attachments = results.get(fetch_attachments, attachments)
+    
+    if contributors:
+        logger.debug(f"Contributors: {', '.join([c.get('displayName', 'Unknown') for c in contributors])}")
+    if attachments:
+        logger.debug(f"Found {len(attachments)} attachment(s)")
+    
+    return page_content, contributors, attachments
+
+
 def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Export Confluence pages to PDF')
     parser.add_argument('--debug', action='store_true', help='Enable debug logging')
+    parser.add_argument('--workers', type=int, default=10,
+                        help='Number of pages fetched and exported in parallel (default: 10)')
+    parser.add_argument('--cache', action='store_true',
+                        help='Cache Confluence responses on disk to speed up repeated exports')
+    parser.add_argument('--storage', action='store_true',
+                        help='Export the storage format instead of the rendered view (faster, but macros are not rendered)')
     args = parser.parse_args()
     
     # Setup logging
@@ -61,16 +183,33 @@ def main():
     try:
         # Initialize clients
         logger.info("Connecting to Confluence...")
-        confluence = ConfluenceClient(confluence_url, username, api_token)
-        exporter = PDFExporter(output_dir)
+        cache_path = '.confluence_cache' if args.cache else None
+        # Discovery's pool and the fetch threads (one per worker each) can issue
+        # requests alongside the client's own pool (16 threads), so keep a pooled
+        # connection for each of them
+        confluence = ConfluenceClient(confluence_url, username, api_token,
+                                      cache_path=cache_path, prefer_storage=args.storage,
+                                      max_connections=max(32, 2 * args.workers + 16))
+        # Pages are rendered in worker processes, one per core at most
+        render_processes = min(max(1, args.workers), os.cpu_count() or 1)
+        exporter = PDFExporter(output_dir, processes=render_processes)
         
-        all_pages_with_paths = []
         space_name = None
         
         # Queue-based approach: (content_id, content_type, relative_path, content_dict)
-        # content_dict is None if we need to fetch it, or the actual dict if we already have it
-        todo_queue = []
-        processed_ids = set()
+        # content_dict is None if we need to fetch it, or the actual dict if we already have it.
+        # relative_path is a tuple of folder names, which lets children share their
+        # parent's components; it is only joined into a string once a page is exported
+        todo_queue = deque()
+        enqueued_ids = set()
+        
+        def enqueue(content_id, content_type, relative_path, content_dict):
+            # Pages can be reached through more than one parent, so duplicates
+            # are rejected here rather than after they have been dequeued
+            if content_id in enqueued_ids:
+                return
+            enqueued_ids.add(content_id)
+            todo_queue.append((content_id, content_type, relative_path, content_dict))
         
         # Initialize queue based on entry point
         if confluence.is_space:
@@ -83,7 +222,7 @@ def main():
             # Create space-specific output directory
             space_output_dir = os.path.join(output_dir, space_name)
             os.makedirs(space_output_dir, exist_ok=True)
-            exporter = PDFExporter(space_output_dir)
+            exporter = PDFExporter(space_output_dir, processes=render_processes)
             logger.info(f"Output directory: {space_output_dir}")
             
             # Get all top-level content in space
@@ -97,9 +236,9 @@ def main():
                 # Top-level pages go in root, top-level folders create subdirectories
                 if content_type == 'folder':
                     folder_name = content.get('title', f'folder_{content["id"]}')
-                    todo_queue.append((content['id'], content_type, folder_name, content))
+                    enqueue(content['id'], content_type, (folder_name,), content)
                 else:
-                    todo_queue.append((content['id'], content_type, '', content))
+                    enqueue(content['id'], content_type, (), content)
             
         elif confluence.is_folder:
             logger.info("Detected folder URL")
@@ -109,7 +248,7 @@ def main():
             logger.info(f"Folder: {folder_name}")
             
             # Start with the folder itself - it should create a subdirectory
-            todo_queue.append((confluence.page_id, 'folder', folder_name, folder_info))
+            enqueue(confluence.page_id, 'folder', (folder_name,), folder_info)
             
         else:
             logger.info("Detected page URL")
@@ -118,124 +257,163 @@ def main():
             logger.info(f"Parent page: {parent_page['title']}")
             
             # Start with the page itself
-            todo_queue.append((parent_page['id'], 'page', '', parent_page))
+            enqueue(parent_page['id'], 'page', (), parent_page)
         
-        # Process queue
-        logger.info("Discovering all pages in hierarchy...")
-        while todo_queue:
-            content_id, content_type, current_path, content_dict = todo_queue.pop(0)
-            
-            # Skip if already processed
-            if content_id in processed_ids:
-                continue
-            processed_ids.add(content_id)
-            
-            # Fetch content info if we don't have it
-            if content_dict is None:
-                try:
-                    content_dict = confluence._get_content_info(content_id)
-                except Exception as e:
-                    logger.warning(f"Could not fetch info for content ID {content_id}: {str(e)}")
-                    continue
-            
-            content_title = content_dict.get('title', f'untitled_{content_id}')
-            
-            if content_type == 'page':
-                # Add page to export list
-                all_pages_with_paths.append((content_dict, current_path))
-                logger.debug(f"Found page: {content_title}" + (f" (in {current_path})" if current_path else ""))
-                
-                # Children of this page should be in a subfolder named after this page
-                page_folder_name = content_dict.get('title', f'page_{content_id}')
-                child_path = f"{current_path}/{page_folder_name}" if current_path else page_folder_name
+        # Discovery, detail fetching and PDF rendering run as a three-stage
+        # pipeline connected by queues, so pages are fetched and rendered while
+        # the rest of the hierarchy is still being traversed
+        fetch_workers = max(1, args.workers)
+        # Each render thread prepares a page and hands it to a worker process
+        render_workers = render_processes
+        discovery_q = queue.Queue()
+        render_q = queue.Queue(maxsize=render_workers * 2)
+        errors = []
+        # Set on the first error or an interrupt, so every stage drops its remaining work
+        stop = threading.Event()
+        progress_lock = threading.Lock()
+        progress = {'discovered': 0, 'done': 0}
+        
+        def discover():
+            try:
+                # Process queue one level at a time, fetching the children of every
+                # item in a level concurrently
+                logger.info("Discovering all pages in hierarchy...")
+                discovered = 0
+                with ThreadPoolExecutor(max_workers=fetch_workers) as executor:
+                    while todo_queue and not stop.is_set():
+                        level = []
+                        while todo_queue:
+                            level.append(todo_queue.popleft())
+                        
+                        level_children = executor.map(
+                            lambda item: fetch_children(confluence, item[0], item[3]),
+                            level
+                        )
+                        
+                        for (content_id, content_type, current_path, _), children in zip(level, level_children):
+                            content_dict, child_pages, child_folders = children
+                            if content_dict is None:
+                                continue
+                            
+                            content_title = content_dict.get('title', f'untitled_{content_id}')
+                            
+                            if content_type == 'page':
+                                # Hand the page over to the fetch stage
+                                discovery_q.put((content_dict, '/'.join(current_path)))
+                                discovered += 1
+                                logger.debug(f"Found page: {content_title}" + (f" (in {'/'.join(current_path)})" if current_path else ""))
+                                
+                                # Children of this page should be in a subfolder named after this page
+                                page_folder_name = content_dict.get('title', f'page_{content_id}')
+                                child_path = current_path + (page_folder_name,)
+                                
+                                for child_page in child_pages:
+                                    enqueue(child_page['id'], 'page', child_path, child_page)
+                                
+                                for child_folder in child_folders:
+                                    folder_name = child_folder.get('title', f'folder_{child_folder["id"]}')
+                                    folder_path = child_path + (folder_name,)
+                                    enqueue(child_folder['id'], 'folder', folder_path, child_folder)
+                            
+                            elif content_type == 'folder':
+                                logger.debug(f"Processing folder: {content_title}" + (f" (path: {'/'.join(current_path)})" if current_path else ""))
+                                
+                                for page in child_pages:
+                                    # Pages in folder should use the folder's path
+                                    enqueue(page['id'], 'page', current_path, page)
+                                
+                                for subfolder in child_folders:
+                                    subfolder_name = subfolder.get('title', f'folder_{subfolder["id"]}')
+                                    # Subfolders should append their name to current path
+                                    subfolder_path = current_path + (subfolder_name,)
+                                    enqueue(subfolder['id'], 'folder', subfolder_path, subfolder)
                 
-                # Get child pages and folders
+                progress['discovered'] = discovered
+                logger.info(f"Total pages discovered: {discovered}")
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                # One sentinel per fetcher
+                for _ in range(fetch_workers):
+                    discovery_q.put(None)
+        
+        def fetch():
+            while True:
+                item = discovery_q.get()
+                if item is None:
+                    return
+                if stop.is_set():
+                    continue
+                page, relative_path = item
                 try:
-                    child_pages = confluence._get_folder_contents(content_id, 'page')
-                    for child_page in child_pages:
-                        if child_page['id'] not in processed_ids:
-                            todo_queue.append((child_page['id'], 'page', child_path, child_page))
+                    # Pages whose PDF is up to date need none of their details
+                    if exporter.is_up_to_date(page, relative_path):
+                        logger.info(f"⊘ Skipped (already exists): {page['title']}")
+                        continue
+                    render_q.put((page, relative_path, fetch_page_details(confluence, page)))
                 except Exception as e:
-                    logger.debug(f"Could not fetch child pages: {str(e)}")
+                    errors.append(e)
+                    stop.set()
+        
+        def render():
+            while True:
+                item = render_q.get()
+                if item is None:
+                    return
+                if stop.is_set():
+                    continue
+                page, relative_path, (page_content, contributors, attachments) = item
                 
-                try:
-                    child_folders = confluence._get_folder_contents(content_id, 'folder')
-                    for child_folder in child_folders:
-                        if child_folder['id'] not in processed_ids:
-                            folder_name = child_folder.get('title', f'folder_{child_folder["id"]}')
-                            folder_path = f"{child_path}/{folder_name}"
-                            todo_queue.append((child_folder['id'], 'folder', folder_path, child_folder))
-                except Exception as e:
-                    logger.debug(f"Could not fetch child folders: {str(e)}")
-            
-            elif content_type == 'folder':
-                logger.debug(f"Processing folder: {content_title}" + (f" (path: {current_path})" if current_path else ""))
+                with progress_lock:
+                    progress['done'] += 1
+                    logger.info(f"[{progress['done']}] Exporting: {page['title']}")
+                    if relative_path:
+                        logger.debug(f"Output path: {relative_path}/{page['title']}.pdf")
+                    else:
+                        logger.debug(f"Output path: {page['title']}.pdf (root)")
                 
-                # Get pages in folder
+                # Export to PDF with attachments, path, and contributors
                 try:
-                    folder_pages = confluence._get_folder_contents(content_id, 'page')
-                    for page in folder_pages:
-                        if page['id'] not in processed_ids:
-                            # Pages in folder should use the folder's path
-                            todo_queue.append((page['id'], 'page', current_path, page))
+                    exporter.export_to_pdf(page, page_content, attachments, relative_path, confluence, contributors)
                 except Exception as e:
-                    logger.debug(f"Could not fetch pages in folder: {str(e)}")
-                
-                # Get subfolders
-                try:
-                    subfolders = confluence._get_folder_contents(content_id, 'folder')
-                    for subfolder in subfolders:
-                        if subfolder['id'] not in processed_ids:
-                            subfolder_name = subfolder.get('title', f'folder_{subfolder["id"]}')
-                            # Subfolders should append their name to current path
-                            subfolder_path = f"{current_path}/{subfolder_name}" if current_path else subfolder_name
-                            todo_queue.append((subfolder['id'], 'folder', subfolder_path, subfolder))
-                except Exception as e:
-                    logger.debug(f"Could not fetch subfolders: {str(e)}")
-        
-        if not all_pages_with_paths:
-            logger.info("No pages found")
-            sys.exit(0)
-        
-        logger.info(f"Total pages discovered: {len(all_pages_with_paths)}")
+                    errors.append(e)
+                    stop.set()
         
-        # Export all pages
         logger.info("=" * 60)
-        logger.info(f"Exporting {len(all_pages_with_paths)} page(s) to PDF...")
+        logger.info("Exporting pages to PDF...")
         logger.info("=" * 60)
         
-        for i, (page, relative_path) in enumerate(all_pages_with_paths, 1):
-            logger.info(f"[{i}/{len(all_pages_with_paths)}] Exporting: {page['title']}")
-            if relative_path:
-                logger.debug(f"Output path: {relative_path}/{page['title']}.pdf")
-            else:
-                logger.debug(f"Output path: {page['title']}.pdf (root)")
-            
-            # Get page content
-            page_content = confluence.get_page_content(page['id'])
-            
-            # Get page properties (including contributors/owners)
-            contributors = []
-            try:
-                properties = confluence.get_page_properties(page['id'])
-                # Extract contributors list from properties
-                if 'contributors' in properties:
-                    contributors = properties['contributors']
-                    logger.debug(f"Contributors: {', '.join([c.get('displayName', 'Unknown') for c in contributors])}")
-            except Exception as e:
-                logger.debug(f"Could not fetch contributors: {str(e)}")
-            
-            # Get attachments for this page
-            try:
-                attachments = confluence.get_page_attachments(page['id'])
-                if attachments:
-                    logger.debug(f"Found {len(attachments)} attachment(s)")
-            except Exception as e:
-                logger.debug(f"Could not fetch attachments: {str(e)}")
-                attachments = []
-            
-            # Export to PDF with attachments, path, and contributors
-            exporter.export_to_pdf(page, page_content, attachments, relative_path, confluence, contributors)
+        discovery_thread = threading.Thread(target=discover)
+        fetch_threads = [threading.Thread(target=fetch) for _ in range(fetch_workers)]
+        render_threads = [threading.Thread(target=render) for _ in range(render_workers)]
+        for thread in [discovery_thread] + fetch_threads + render_threads:
+            thread.start()
+        
+        try:
+            for thread in [discovery_thread] + fetch_threads:
+                thread.join()
+        except BaseException:
+            # Interrupted (e.g. Ctrl-C), have every stage skip its remaining work
+            stop.set()
+            raise
+        finally:
+            # Shut the stages down in order once each upstream stage is finished.
+            # Stopped stages keep draining their queues, so none is left blocked
+            for thread in [discovery_thread] + fetch_threads:
+                thread.join()
+            for _ in render_threads:
+                render_q.put(None)
+            for thread in render_threads:
+                thread.join()
+            exporter.close(cancel_futures=stop.is_set())
+        
+        if errors:
+            raise errors[0]
+        
+        if not progress['discovered']:
+            logger.info("No pages found")
+            sys.exit(0)
         
         logger.info("=" * 60)
         if confluence.is_space:
@@ -4,359 +4,624 @@ Converts Confluence HTML content to PDF files
 """
 import os
 import re
-import base64
+import hashlib
+import mimetypes
 import logging
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+from html import escape
 from io import BytesIO
+from pathlib import Path
 from urllib.parse import urljoin
 from weasyprint import HTML, CSS
-from bs4 import BeautifulSoup
+from weasyprint.text.fonts import FontConfiguration
 
 logger = logging.getLogger(__name__)
 
+# Translation tables deleting characters that are invalid in paths and filenames
+_PATH_INVALID_CHARS = str.maketrans('', '', '<>:"|?*')
+_FILENAME_INVALID_CHARS = str.maketrans('', '', '<>:"/\\|?*')
+_SLASHES_RE = re.compile(r'/+')
 
-class PDFExporter:
-    """Exports Confluence pages to PDF format"""
-    
-    def __init__(self, output_dir):
-        """
-        Initialize PDF exporter
-        
-        Args:
-            output_dir: Directory to save PDF files
-        """
-        self.output_dir = output_dir
-        os.makedirs(output_dir, exist_ok=True)
-    
-    def _parse_and_sort_contributors(self, contributors_data):
-        """
-        Parse contributors data and sort alphabetically by first name
-        
-        Args:
-            contributors_data: Contributors information from Confluence (list of dicts with displayName, profilePicture, etc.)
-            
-        Returns:
-            list: Sorted list of contributor dictionaries
-        """
-        contributors = []
-        
-        # Handle different data formats
-        if isinstance(contributors_data, list):
-            # Already in the expected format from get_page_properties
-            contributors = contributors_data
-        elif isinstance(contributors_data, str):
-            # Fallback: Split by common delimiters and create simple dict entries
-            names = re.split(r'[,;\n]+', contributors_data)
-            contributors = [{'displayName': name.strip()} for name in names if name.strip()]
-        elif isinstance(contributors_data, dict):
-            # Single contributor as dict
-            contributors = [contributors_data]
-        
-        # Sort by first name from displayName
-        def get_first_name(contributor):
-            if isinstance(contributor, dict):
-                name = contributor.get('displayName', '')
-            else:
-                name = str(contributor)
-            
-            name = name.strip()
-            # Handle "Last, First" format
-            if ',' in name:
-                parts = name.split(',')
-                if len(parts) > 1:
-                    return parts[1].strip().lower()
-            # Handle "First Last" format
-            parts = name.split()
-            if parts:
-                return parts[0].lower()
-            return name.lower()
-        
-        contributors.sort(key=get_first_name)
-        
-        return contributors
-    
-    def _sanitize_path(self, path):
-        """
-        Sanitize a path to be filesystem-safe
-        
-        Args:
-            path: Original path
-            
-        Returns:
-            str: Sanitized path
-        """
-        # Remove or replace invalid characters
-        path = re.sub(r'[<>:"|?*]', '', path)
-        # Clean up multiple slashes
-        path = re.sub(r'/+', '/', path)
-        return path.strip('/')
-    
-    def _sanitize_filename(self, filename):
-        """
-        Sanitize filename to be filesystem-safe
-        
-        Args:
-            filename: Original filename
-            
-        Returns:
-            str: Sanitized filename
-        """
-        # Remove invalid characters
-        filename = re.sub(r'[<>:"/\\|?*]', '', filename)
-        # Replace spaces with underscores
-        filename = filename.replace(' ', '_')
-        # Limit length
-        if len(filename) > 200:
-            filename = filename[:200]
-        return filename
-    
-    def _clean_html(self, html_content):
-        """
-        Clean and prepare HTML content for PDF conversion
-        
-        Args:
-            html_content: Raw HTML content
-            
-        Returns:
-            str: Cleaned HTML content
-        """
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Remove Confluence-specific macros that might not render well
-        for macro in soup.find_all('ac:structured-macro'):
-            macro.decompose()
-        
-        # Convert relative URLs to absolute if needed
-        # (This would require the base URL - simplified for now)
-        
-        return str(soup)
-    
-    def _create_html_template(self, title, content):
-        """
-        Create a complete HTML document with styling
-        
-        Args:
-            title: Page title
-            content: HTML content
-            
-        Returns:
-            str: Complete HTML document
-        """
-        html = f"""
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <title>{title}</title>
-    <style>
-        @page {{
+# Delimiters between names in a plain-text contributors list
+_NAME_DELIMITERS_RE = re.compile(r'[,;\n]+')
+
+# Innermost Confluence macro elements (no macro nested inside), either
+# self-closing or with their content
+_MACRO_RE = re.compile(
+    r'<ac:structured-macro\b[^>]*/>'
+    r'|<ac:structured-macro\b[^>]*>(?:(?!<ac:structured-macro\b).)*?</ac:structured-macro>',
+    re.DOTALL
+)
+
+# Page stylesheet, shared by every exported page
+_BASE_CSS = """\
+        @page {
             size: A4;
             margin: 2cm;
-            @bottom-right {{
+            @bottom-right {
                 content: counter(page);
-            }}
-        }}
-        body {{
+            }
+        }
+        body {
             font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
             line-height: 1.6;
             color: #172B4D;
             max-width: 100%;
-        }}
-        h1 {{
+        }
+        h1 {
             color: #172B4D;
             border-bottom: 2px solid #0052CC;
             padding-bottom: 10px;
             margin-top: 20px;
-        }}
-        h2 {{
+        }
+        h2 {
             color: #172B4D;
             border-bottom: 1px solid #DFE1E6;
             padding-bottom: 8px;
             margin-top: 18px;
-        }}
-        h3, h4, h5, h6 {{
+        }
+        h3, h4, h5, h6 {
             color: #172B4D;
             margin-top: 16px;
-        }}
-        code {{
+        }
+        code {
             background-color: #F4F5F7;
             padding: 2px 6px;
             border-radius: 3px;
             font-family: "SFMono-Regular", Consolas, "Liberation Mono", Menlo, Courier, monospace;
             font-size: 0.9em;
-        }}
-        pre {{
+        }
+        pre {
             background-color: #F4F5F7;
             padding: 12px;
             border-radius: 3px;
             overflow-x: auto;
             border-left: 3px solid #0052CC;
-        }}
-        pre code {{
+        }
+        pre code {
             background-color: transparent;
             padding: 0;
-        }}
-        table {{
+        }
+        table {
             border-collapse: collapse;
             width: 100%;
             margin: 16px 0;
-        }}
-        th, td {{
+        }
+        th, td {
             border: 1px solid #DFE1E6;
             padding: 8px 12px;
             text-align: left;
-        }}
-        th {{
+        }
+        th {
             background-color: #F4F5F7;
             font-weight: 600;
-        }}
-        img {{
+        }
+        img {
             max-width: 100%;
             height: auto;
-        }}
-        a {{
+        }
+        a {
             color: #0052CC;
             text-decoration: none;
-        }}
-        blockquote {{
+        }
+        blockquote {
             border-left: 4px solid #0052CC;
             padding-left: 16px;
             margin-left: 0;
             color: #5E6C84;
-        }}
-        .page-title {{
+        }
+        .page-title {
             font-size: 2em;
             color: #172B4D;
             margin-bottom: 20px;
             border-bottom: 3px solid #0052CC;
             padding-bottom: 10px;
-        }}
-        .owners-section {{
+        }
+"""
+
+# Styles of the optional page sections, only included when a page has them
+_CONTRIBUTORS_CSS = """\
+        .owners-section {
             margin-top: 10px;
             margin-bottom: 30px;
             padding: 15px;
             background-color: #E3FCEF;
             border-radius: 5px;
             border-left: 4px solid #00875A;
-        }}
-        .owners-title {{
+        }
+        .owners-title {
             font-size: 1.1em;
             color: #006644;
             margin-bottom: 10px;
             font-weight: 600;
-        }}
-        .owners-list {{
+        }
+        .owners-list {
             list-style: none;
             padding: 0;
             margin: 0;
-        }}
-        .owner-item {{
+        }
+        .owner-item {
             padding: 8px 0;
             color: #172B4D;
             font-weight: 500;
             display: flex;
             align-items: center;
-        }}
-        .contributor-avatar {{
+        }
+        .contributor-avatar {
             width: 32px;
             height: 32px;
             border-radius: 50%;
             margin-right: 10px;
             border: 2px solid #00875A;
             object-fit: cover;
-        }}
-        .contributor-name {{
+        }
+        .contributor-name {
             flex: 1;
-        }}
-        .creator-badge {{
+        }
+        .creator-badge {
             font-size: 0.85em;
             color: #006644;
             font-weight: 600;
             margin-left: 8px;
-        }}
-        .attachments-section {{
+        }
+"""
+_ATTACHMENTS_CSS = """\
+        .attachments-section {
             margin-top: 40px;
             padding: 20px;
             background-color: #F4F5F7;
             border-radius: 5px;
             border-left: 4px solid #0052CC;
-        }}
-        .attachments-title {{
+        }
+        .attachments-title {
             font-size: 1.3em;
             color: #172B4D;
             margin-bottom: 15px;
             font-weight: 600;
-        }}
-        .attachment-list {{
+        }
+        .attachment-list {
             list-style: none;
             padding: 0;
-        }}
-        .attachment-item {{
+        }
+        .attachment-item {
             padding: 8px 0;
             border-bottom: 1px solid #DFE1E6;
-        }}
-        .attachment-item:last-child {{
+        }
+        .attachment-item:last-child {
             border-bottom: none;
-        }}
-        .attachment-link {{
+        }
+        .attachment-link {
             color: #0052CC;
             text-decoration: none;
             font-weight: 500;
-        }}
-        .attachment-info {{
+        }
+        .attachment-info {
             font-size: 0.9em;
             color: #5E6C84;
             margin-left: 10px;
-        }}
-        .version-history-section {{
+        }
+"""
+_VERSION_HISTORY_CSS = """\
+        .version-history-section {
             margin-top: 40px;
             padding: 20px;
             background-color: #F4F5F7;
             border-radius: 5px;
             border-left: 4px solid #6554C0;
             page-break-before: auto;
-        }}
-        .version-history-title {{
+        }
+        .version-history-title {
             font-size: 1.3em;
             color: #172B4D;
             margin-bottom: 15px;
             font-weight: 600;
-        }}
-        .version-history-table {{
+        }
+        .version-history-table {
             width: 100%;
             border-collapse: collapse;
             font-size: 0.9em;
-        }}
-        .version-history-table th {{
+        }
+        .version-history-table th {
             background-color: #DFE1E6;
             color: #172B4D;
             font-weight: 600;
             padding: 8px 12px;
             text-align: left;
             border: 1px solid #C1C7D0;
-        }}
-        .version-history-table td {{
+        }
+        .version-history-table td {
             padding: 6px 12px;
             border: 1px solid #DFE1E6;
             color: #172B4D;
-        }}
-        .version-history-table tr:nth-child(even) {{
+        }
+        .version-history-table tr:nth-child(even) {
             background-color: #FAFBFC;
-        }}
-        .version-number {{
+        }
+        .version-number {
             font-weight: 600;
             color: #6554C0;
-        }}
-    </style>
+        }
+"""
+_SECTION_CSS = {
+    'contributors': _CONTRIBUTORS_CSS,
+    'attachments': _ATTACHMENTS_CSS,
+    'version_history': _VERSION_HISTORY_CSS
+}
+
+# Static parts of the page template, around the title and content
+_TEMPLATE_HEAD = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>"""
+_TEMPLATE_BODY = """</title>
 </head>
 <body>
-    <div class="page-title">{title}</div>
+    <div class="page-title">"""
+_TEMPLATE_CONTENT = """</div>
     <div class="content">
-        {content}
+        """
+_TEMPLATE_TAIL = """
     </div>
 </body>
 </html>
 """
-        return html
+
+
+@lru_cache(maxsize=None)
+def _escape(text):
+    """
+    HTML-escape a string taken from Confluence
+    
+    Names, titles and dates repeat across pages, so results are memoized.
+    
+    Args:
+        text: Original text
+        
+    Returns:
+        str: Text safe to insert into HTML content and attribute values
+    """
+    return escape(str(text))
+
+
+def _parse_when(when):
+    """
+    Parse an ISO 8601 timestamp from Confluence
+    
+    Args:
+        when: Timestamp such as '2024-01-31T12:00:00.000Z'
+        
+    Returns:
+        datetime: Parsed timestamp
+        
+    Raises:
+        ValueError: If the timestamp can't be parsed
+    """
+    # fromisoformat() doesn't accept the 'Z' suffix before Python 3.11
+    if when.endswith('Z'):
+        when = when[:-1] + '+00:00'
+    return datetime.fromisoformat(when)
+
+
+@lru_cache(maxsize=None)
+def _format_date(when):
+    """
+    Format an ISO 8601 timestamp from Confluence for display
+    
+    Args:
+        when: Timestamp such as '2024-01-31T12:00:00.000Z'
+        
+    Returns:
+        str: Timestamp as 'YYYY-MM-DD HH:MM:SS', or unchanged if it can't be parsed
+    """
+    if not when or when == 'Unknown':
+        return when
+    try:
+        return _parse_when(when).strftime('%Y-%m-%d %H:%M:%S')
+    except Exception:
+        return when  # Keep original format if parsing fails
+
+
+def _version_timestamp(page_info):
+    """
+    Get the time the current version of a page was published
+    
+    Args:
+        page_info: Dictionary containing page information, with version expanded
+        
+    Returns:
+        int: Seconds since the epoch, or None if the page has no version date
+    """
+    when = page_info.get('version', {}).get('when')
+    if not when:
+        return None
+    try:
+        return int(_parse_when(when).timestamp())
+    except Exception:
+        return None
+
+
+# Row of the version history table: version number, date and author
+_VERSION_ROW_TEMPLATE = (
+    '      <tr>\n'
+    '        <td><span class="version-number">v%s</span></td>\n'
+    '        <td>%s</td>\n'
+    '        <td>%s</td>\n'
+    '      </tr>\n'
+)
+
+
+@lru_cache(maxsize=None)
+def _first_name(name):
+    """
+    Get the lowercased first name of a contributor, used to sort contributors
+    
+    Contributors repeat across pages, so results are memoized.
+    
+    Args:
+        name: Display name, either "First Last" or "Last, First"
+        
+    Returns:
+        str: First name in lowercase
+    """
+    name = name.strip()
+    # Handle "Last, First" format
+    _, comma, rest = name.partition(',')
+    if comma:
+        return rest.partition(',')[0].strip().lower()
+    # Handle "First Last" format
+    parts = name.split(None, 1)
+    if parts:
+        return parts[0].lower()
+    return name.lower()
+
+
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB')
+
+
+def _format_size(size):
+    """
+    Format a file size in bytes as a human readable string
+    
+    Args:
+        size: Size in bytes
+        
+    Returns:
+        str: Size such as '512 B', '1.5 KB' or '2.0 MB'
+    """
+    # Every unit is 2**10 times the previous one, so the bit length of the
+    # size picks the unit directly
+    unit = min(len(_SIZE_UNITS) - 1, (size.bit_length() - 1) // 10) if size > 0 else 0
+    if unit == 0:
+        return f"{size} B"
+    return f"{size / (1 << (10 * unit)):.1f} {_SIZE_UNITS[unit]}"
+
+
+@lru_cache(maxsize=None)
+def _sanitize_path(path):
+    """
+    Sanitize a path to be filesystem-safe
+    
+    Args:
+        path: Original path
+        
+    Returns:
+        str: Sanitized path
+    """
+    # Remove or replace invalid characters
+    path = path.translate(_PATH_INVALID_CHARS)
+    # Clean up multiple slashes
+    path = _SLASHES_RE.sub('/', path)
+    return path.strip('/')
+
+
+@lru_cache(maxsize=None)
+def _sanitize_filename(filename):
+    """
+    Sanitize filename to be filesystem-safe
+    
+    Args:
+        filename: Original filename
+        
+    Returns:
+        str: Sanitized filename
+    """
+    # Remove invalid characters, replace spaces with underscores and limit length
+    return filename.translate(_FILENAME_INVALID_CHARS).replace(' ', '_')[:200]
+
+
+class PDFExporter:
+    """Exports Confluence pages to PDF format"""
+    
+    def __init__(self, output_dir, processes=0):
+        """
+        Initialize PDF exporter
+        
+        Args:
+            output_dir: Directory to save PDF files
+            processes: Number of worker processes PDFs are rendered in, or 0 to
+                render in the calling thread. WeasyPrint is CPU bound, so worker
+                processes let several pages render on separate cores
+        """
+        self.output_dir = output_dir
+        self.processes = processes
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # Output directories already created, so pages sharing a folder only
+        # create it once
+        self._created_dirs = {output_dir}
+        
+        # Profile picture file URLs keyed by profile picture path, as the same
+        # contributors appear on many pages
+        self._avatar_dir = os.path.join(output_dir, '.avatars')
+        self._avatar_cache = {}
+        
+        # Stylesheets parsed once up front and passed to WeasyPrint for every
+        # page, rather than embedded in each page and parsed again
+        self._base_stylesheet = CSS(string=_BASE_CSS)
+        self._section_stylesheets = {
+            section: CSS(string=css) for section, css in _SECTION_CSS.items()
+        }
+        
+        # Font configuration and image cache reused across pages, so fonts are
+        # only looked up and images only decoded once. Font configurations
+        # wrap Pango/fontconfig state, so each rendering thread gets its own
+        self._thread_local = threading.local()
+        self._image_cache = {}
+        
+        # Threads fetching version histories while pages are being prepared.
+        # Separate from the client's pool, which is kept busy with attachment
+        # downloads, so a history request never waits behind them
+        self._history_pool = ThreadPoolExecutor(max_workers=max(4, processes))
+        
+        # Worker processes for rendering, started on first use
+        self._render_pool = None
+        self._render_pool_lock = threading.Lock()
+    
+    def _parse_and_sort_contributors(self, contributors_data):
+        """
+        Parse contributors data and sort alphabetically by first name
+        
+        Args:
+            contributors_data: Contributors information from Confluence (list of dicts with displayName, profilePicture, etc.)
+            
+        Returns:
+            list: Sorted list of contributor dictionaries
+        """
+        contributors = []
+        
+        # Handle different data formats
+        if isinstance(contributors_data, list):
+            # Already in the expected format from get_page_properties
+            contributors = contributors_data
+        elif isinstance(contributors_data, str):
+            # Fallback: Split by common delimiters and create simple dict entries
+            names = _NAME_DELIMITERS_RE.split(contributors_data)
+            contributors = [{'displayName': name.strip()} for name in names if name.strip()]
+        elif isinstance(contributors_data, dict):
+            # Single contributor as dict
+            contributors = [contributors_data]
+        
+        # Sort by first name from displayName, computing every key up front
+        keys = [
+            _first_name(contributor.get('displayName', '') if isinstance(contributor, dict) else str(contributor))
+            for contributor in contributors
+        ]
+        contributors = [contributor for _, contributor in sorted(zip(keys, contributors), key=itemgetter(0))]
+        
+        return contributors
+    
+    def _sanitize_path(self, path):
+        """
+        Sanitize a path to be filesystem-safe
+        
+        Page paths repeat for every page in a folder, so results are memoized.
+        
+        Args:
+            path: Original path
+            
+        Returns:
+            str: Sanitized path
+        """
+        return _sanitize_path(path)
+    
+    def _sanitize_filename(self, filename):
+        """
+        Sanitize filename to be filesystem-safe
+        
+        Titles are sanitized for both the PDF and its attachments folder, so
+        results are memoized.
+        
+        Args:
+            filename: Original filename
+            
+        Returns:
+            str: Sanitized filename
+        """
+        return _sanitize_filename(filename)
+    
+    def _ensure_dir(self, path):
+        """
+        Create a directory (and its parents) unless it was created before
+        
+        Args:
+            path: Directory path
+        """
+        if path in self._created_dirs:
+            return
+        # exist_ok covers two threads creating the same directory at once
+        os.makedirs(path, exist_ok=True)
+        self._created_dirs.add(path)
+    
+    def _clean_html(self, html_content):
+        """
+        Clean and prepare HTML content for PDF conversion
+        
+        Args:
+            html_content: Raw HTML content
+            
+        Returns:
+            str: Cleaned HTML content
+        """
+        # Remove Confluence-specific macros that might not render well. Macros
+        # can be nested, so innermost ones are removed until none are left
+        count = 1
+        while count:
+            html_content, count = _MACRO_RE.subn('', html_content)
+        
+        # Convert relative URLs to absolute if needed
+        # (This would require the base URL - simplified for now)
+        
+        return html_content
+    
+    def _get_font_config(self):
+        """
+        Get the font configuration of the current thread
+        
+        Returns:
+            FontConfiguration: WeasyPrint font configuration
+        """
+        font_config = getattr(self._thread_local, 'font_config', None)
+        if font_config is None:
+            font_config = self._thread_local.font_config = FontConfiguration()
+        return font_config
+    
+    def _create_html_template(self, title, content):
+        """
+        Create a complete HTML document
+        
+        Styles are not embedded, see _get_stylesheets.
+        
+        Args:
+            title: Page title
+            content: HTML content
+            
+        Returns:
+            str: Complete HTML document
+        """
+        title = _escape(title)
+        return f"{_TEMPLATE_HEAD}{title}{_TEMPLATE_BODY}{title}{_TEMPLATE_CONTENT}{content}{_TEMPLATE_TAIL}"
+    
+    def _get_stylesheets(self, sections=()):
+        """
+        Get the pre-parsed stylesheets for a page
+        
+        Args:
+            sections: Names of the optional sections included in the page
+                ('contributors', 'attachments', 'version_history')
+            
+        Returns:
+            list: WeasyPrint CSS objects
+        """
+        # Only include the styles of sections the page actually has, as
+        # WeasyPrint has to process every rule whether it is used or not
+        return [self._base_stylesheet] + [self._section_stylesheets[section] for section in sections]
     
     def _create_contributors_html(self, contributors, confluence_client=None):
         """
@@ -372,26 +637,31 @@ class PDFExporter:
         if not contributors:
             return ""
         
-        html = '<div class="owners-section">\n'
-        html += '  <div class="owners-title">� Contributor'
-        if len(contributors) > 1:
-            html += 's'
-        html += '</div>\n'
-        html += '  <ul class="owners-list">\n'
+        plural = 's' if len(contributors) > 1 else ''
+        parts = [
+            '<div class="owners-section">\n'
+            f'  <div class="owners-title">� Contributor{plural}</div>\n'
+            '  <ul class="owners-list">\n'
+        ]
+        
+        # Download all profile pictures up front, concurrently
+        profile_urls = {}
+        if confluence_client:
+            profile_urls = self._prefetch_profile_pictures(contributors, confluence_client)
         
         for contributor in contributors:
             if isinstance(contributor, dict):
-                display_name = contributor.get('displayName', 'Unknown')
+                display_name = _escape(contributor.get('displayName', 'Unknown'))
                 profile_pic = contributor.get('profilePicture', '')
                 is_creator = contributor.get('isCreator', False)
                 
                 # Generate avatar HTML
                 avatar_html = ''
                 if profile_pic and confluence_client:
-                    # Download and convert profile picture to base64 data URL
-                    profile_data_url = self._get_profile_picture_data_url(profile_pic, confluence_client)
-                    if profile_data_url:
-                        avatar_html = f'<img src="{profile_data_url}" class="contributor-avatar" alt="{display_name}">'
+                    # Profile picture downloaded to the avatars folder
+                    profile_url = profile_urls.get(profile_pic)
+                    if profile_url:
+                        avatar_html = f'<img src="{_escape(profile_url)}" class="contributor-avatar" alt="{display_name}">'
                     else:
                         # Use default avatar emoji if download fails
                         avatar_html = '<span style="font-size: 32px; margin-right: 10px;">👤</span>'
@@ -404,33 +674,67 @@ class PDFExporter:
                 if is_creator:
                     creator_badge = '<span class="creator-badge">✨ Creator</span>'
                 
-                html += f'    <li class="owner-item">\n'
-                html += f'      {avatar_html}\n'
-                html += f'      <span class="contributor-name">{display_name}{creator_badge}</span>\n'
-                html += f'    </li>\n'
+                parts.append(
+                    f'    <li class="owner-item">\n'
+                    f'      {avatar_html}\n'
+                    f'      <span class="contributor-name">{display_name}{creator_badge}</span>\n'
+                    f'    </li>\n'
+                )
             else:
                 # Fallback for simple string format
-                html += f'    <li class="owner-item">\n'
-                html += f'      <span style="font-size: 32px; margin-right: 10px;">👤</span>\n'
-                html += f'      <span class="contributor-name">{contributor}</span>\n'
-                html += f'    </li>\n'
+                parts.append(
+                    f'    <li class="owner-item">\n'
+                    f'      <span style="font-size: 32px; margin-right: 10px;">👤</span>\n'
+                    f'      <span class="contributor-name">{_escape(contributor)}</span>\n'
+                    f'    </li>\n'
+                )
         
-        html += '  </ul>\n'
-        html += '</div>\n'
+        parts.append('  </ul>\n'
+                     '</div>\n')
+        
+        return ''.join(parts)
+    
+    def _prefetch_profile_pictures(self, contributors, confluence_client):
+        """
+        Download the profile pictures of all contributors concurrently
         
-        return html
+        Args:
+            contributors: List of contributor dictionaries
+            confluence_client: ConfluenceClient instance for downloading
+            
+        Returns:
+            dict: Mapping of profile picture path to file:// URL (or None if
+                the download failed)
+        """
+        profile_pics = list(dict.fromkeys(
+            contributor.get('profilePicture') for contributor in contributors
+            if isinstance(contributor, dict) and contributor.get('profilePicture')
+        ))
+        data_urls = confluence_client._map_concurrently(
+            lambda path: self._get_profile_picture_url(path, confluence_client),
+            profile_pics
+        )
+        return dict(zip(profile_pics, data_urls))
     
-    def _get_profile_picture_data_url(self, profile_pic_path, confluence_client):
+    def _get_profile_picture_url(self, profile_pic_path, confluence_client):
         """
-        Download profile picture and convert to base64 data URL
+        Download profile picture to the avatars folder
+        
+        Pictures are referenced from pages as file:// URLs rather than embedded
+        as base64, which keeps them out of every page's HTML and lets WeasyPrint
+        load them straight from disk.
         
         Args:
             profile_pic_path: Path to profile picture from Confluence API
             confluence_client: ConfluenceClient instance for downloading
             
         Returns:
-            str: Base64 data URL or None if download fails
+            str: file:// URL of the picture or None if download fails
         """
+        if profile_pic_path in self._avatar_cache:
+            return self._avatar_cache[profile_pic_path]
+        
+        file_url = None
         try:
             # Make profile picture URL absolute
             if not profile_pic_path.startswith('http'):
@@ -442,17 +746,25 @@ class PDFExporter:
             response = confluence_client.session.get(profile_url, timeout=5)
             response.raise_for_status()
             
-            # Get content type
-            content_type = response.headers.get('Content-Type', 'image/png')
-            
-            # Convert to base64
-            image_data = base64.b64encode(response.content).decode('utf-8')
-            data_url = f"data:{content_type};base64,{image_data}"
+            # Name the file after its path, with an extension matching its content type
+            content_type = response.headers.get('Content-Type', 'image/png').split(';')[0].strip()
+            extension = mimetypes.guess_extension(content_type) or '.png'
+            filename = hashlib.sha256(profile_pic_path.encode('utf-8')).hexdigest() + extension
             
-            return data_url
+            self._ensure_dir(self._avatar_dir)
+            filepath = os.path.join(self._avatar_dir, filename)
+            partial_filepath = f"{filepath}.{threading.get_ident()}.part"
+            with open(partial_filepath, 'wb') as f:
+                f.write(response.content)
+            os.replace(partial_filepath, filepath)
+            file_url = Path(filepath).resolve().as_uri()
         except Exception as e:
             logger.debug(f"Could not download profile picture from {profile_pic_path}: {str(e)}")
-            return None
+        
+        # Failures are remembered too, so a missing picture doesn't cost a
+        # timeout on every page
+        self._avatar_cache[profile_pic_path] = file_url
+        return file_url
     
     def _create_attachments_html(self, attachments, attachments_folder_name):
         """
@@ -468,31 +780,24 @@ class PDFExporter:
         if not attachments:
             return ""
         
-        html = '<div class="attachments-section">\n'
-        html += '  <div class="attachments-title">📎 Attachments</div>\n'
-        html += '  <ul class="attachment-list">\n'
-        
-        for att in attachments:
-            title = att.get('title', 'Untitled')
-            size = att.get('extensions', {}).get('fileSize', 0)
-            # Convert size to human readable
-            if size < 1024:
-                size_str = f"{size} B"
-            elif size < 1024 * 1024:
-                size_str = f"{size / 1024:.1f} KB"
-            else:
-                size_str = f"{size / (1024 * 1024):.1f} MB"
-            
-            rel_path = f"{attachments_folder_name}/{title}"
-            html += f'    <li class="attachment-item">\n'
-            html += f'      <span class="attachment-link">{title}</span>\n'
-            html += f'      <span class="attachment-info">({size_str}) → {rel_path}</span>\n'
-            html += f'    </li>\n'
-        
-        html += '  </ul>\n'
-        html += '</div>\n'
+        folder_name = _escape(attachments_folder_name)
+        rows = ''.join([
+            f'    <li class="attachment-item">\n'
+            f'      <span class="attachment-link">{title}</span>\n'
+            f'      <span class="attachment-info">({_format_size(att.get("extensions", {}).get("fileSize", 0))}) '
+            f'→ {folder_name}/{title}</span>\n'
+            f'    </li>\n'
+            for att, title in ((att, _escape(att.get('title', 'Untitled'))) for att in attachments)
+        ])
         
-        return html
+        return (
+            '<div class="attachments-section">\n'
+            '  <div class="attachments-title">📎 Attachments</div>\n'
+            '  <ul class="attachment-list">\n'
+            f'{rows}'
+            '  </ul>\n'
+            '</div>\n'
+        )
     
     def _create_version_history_html(self, versions):
         """
@@ -507,17 +812,19 @@ class PDFExporter:
         if not versions:
             return ""
         
-        html = '<div class="version-history-section">\n'
-        html += '  <div class="version-history-title">📜 Version History</div>\n'
-        html += '  <table class="version-history-table">\n'
-        html += '    <thead>\n'
-        html += '      <tr>\n'
-        html += '        <th>Version</th>\n'
-        html += '        <th>Created</th>\n'
-        html += '        <th>Author</th>\n'
-        html += '      </tr>\n'
-        html += '    </thead>\n'
-        html += '    <tbody>\n'
+        parts = [
+            '<div class="version-history-section">\n'
+            '  <div class="version-history-title">📜 Version History</div>\n'
+            '  <table class="version-history-table">\n'
+            '    <thead>\n'
+            '      <tr>\n'
+            '        <th>Version</th>\n'
+            '        <th>Created</th>\n'
+            '        <th>Author</th>\n'
+            '      </tr>\n'
+            '    </thead>\n'
+            '    <tbody>\n'
+        ]
         
         # Sort versions by number descending (newest first)
         sorted_versions = sorted(versions, key=lambda v: v.get('number', 0), reverse=True)
@@ -528,26 +835,36 @@ class PDFExporter:
             by = version.get('by', 'Unknown')
             
             # Format the date to be more readable
-            try:
-                from datetime import datetime
-                if when and when != 'Unknown':
-                    # Parse ISO format date
-                    dt = datetime.fromisoformat(when.replace('Z', '+00:00'))
-                    when = dt.strftime('%Y-%m-%d %H:%M:%S')
-            except Exception:
-                pass  # Keep original format if parsing fails
+            when = _format_date(when)
             
-            html += f'      <tr>\n'
-            html += f'        <td><span class="version-number">v{version_num}</span></td>\n'
-            html += f'        <td>{when}</td>\n'
-            html += f'        <td>{by}</td>\n'
-            html += f'      </tr>\n'
+            parts.append(_VERSION_ROW_TEMPLATE % (version_num, _escape(when), _escape(by)))
+        
+        parts.append('    </tbody>\n'
+                     '  </table>\n'
+                     '</div>\n')
+        
+        return ''.join(parts)
+    
+    def is_up_to_date(self, page_info, relative_path=''):
+        """
+        Check whether a page's PDF was already exported from its current version
         
-        html += '    </tbody>\n'
-        html += '  </table>\n'
-        html += '</div>\n'
+        The PDF is recognized by its modification time, so this needs no request
+        for the page's content. PDFs of pages without version information are
+        kept whenever they exist.
         
-        return html
+        Args:
+            page_info: Dictionary containing page information (id, title, version)
+            relative_path: Relative path for organizing output
+            
+        Returns:
+            bool: True if the PDF exists and is up to date
+        """
+        try:
+            exported = int(os.stat(self._get_pdf_path(page_info, relative_path)).st_mtime)
+        except FileNotFoundError:
+            return False
+        return _version_timestamp(page_info) in (None, exported)
     
     def export_to_pdf(self, page_info, html_content, attachments=None, relative_path='', confluence_client=None, owners=None):
         """
@@ -561,27 +878,171 @@ class PDFExporter:
             confluence_client: ConfluenceClient instance for downloading attachments (optional)
             owners: List or string of page owners (optional)
         """
-        logger.debug(f"Exporting page ID {page_info.get('id')} - '{page_info.get('title')}'")
-        # Get page title and create filename
+        prepared = self._prepare_page(page_info, html_content, attachments, relative_path, confluence_client, owners)
+        if prepared is None:
+            return
+        
+        filepath, full_html = prepared[:2]
+        if self.processes:
+            future = self._get_render_pool().submit(_render_in_worker, *prepared)
+            self._finish_page(filepath, full_html, future.result)
+        else:
+            self._finish_page(filepath, full_html, lambda: self._write_pdf(*prepared))
+    
+    def export_many(self, pages_data, confluence_client=None):
+        """
+        Export several Confluence pages to PDF
+        
+        Pages are prepared (attachments, profile pictures, version history) one
+        after another and rendered in parallel on the exporter's worker
+        processes (see processes).
+        
+        Args:
+            pages_data: Iterable of (page_info, html_content, attachments,
+                relative_path, owners) tuples, as passed to export_to_pdf
+            confluence_client: ConfluenceClient instance for downloading attachments (optional)
+        """
+        if not self.processes:
+            for page_info, html_content, attachments, relative_path, owners in pages_data:
+                self.export_to_pdf(page_info, html_content, attachments, relative_path, confluence_client, owners)
+            return
+        
+        pending = []
+        for page_info, html_content, attachments, relative_path, owners in pages_data:
+            prepared = self._prepare_page(page_info, html_content, attachments, relative_path, confluence_client, owners)
+            if prepared is not None:
+                pending.append((prepared, self._get_render_pool().submit(_render_in_worker, *prepared)))
+        
+        for prepared, future in pending:
+            self._finish_page(prepared[0], prepared[1], future.result)
+    
+    def export_combined(self, pages_data, out_path, confluence_client=None):
+        """
+        Export several Confluence pages into a single PDF
+        
+        Each page is laid out once with the shared stylesheets and font
+        configuration, and the laid out pages are merged into one document.
+        Attachments are downloaded as for export_to_pdf.
+        
+        Args:
+            pages_data: Iterable of (page_info, html_content, attachments,
+                relative_path, owners) tuples, as passed to export_to_pdf
+            out_path: Path of the combined PDF file
+            confluence_client: ConfluenceClient instance for downloading attachments (optional)
+        """
+        documents = []
+        for page_info, html_content, attachments, relative_path, owners in pages_data:
+            _, full_html, sections, _ = self._prepare_page(
+                page_info, html_content, attachments, relative_path, confluence_client, owners,
+                skip_existing=False
+            )
+            documents.append(self._render_document(full_html, sections))
+        
+        if not documents:
+            return
+        
+        combined = documents[0].copy([page for document in documents for page in document.pages])
+        try:
+            self._save_document(combined, out_path)
+            logger.debug(f"✓ Saved {len(documents)} page(s) to: {out_path}")
+        except Exception as e:
+            logger.error(f"✗ Error saving {os.path.basename(out_path)}: {str(e)}")
+    
+    def close(self, cancel_futures=False):
+        """
+        Shut down the rendering worker processes, if any were started
+        
+        Args:
+            cancel_futures: Cancel renders that have not started yet instead of
+                waiting for them
+        """
+        with self._render_pool_lock:
+            if self._render_pool is not None:
+                self._render_pool.shutdown(cancel_futures=cancel_futures)
+                self._render_pool = None
+    
+    def _get_render_pool(self):
+        """
+        Get the rendering worker pool, starting it on first use
+        
+        Returns:
+            ProcessPoolExecutor: Worker pool
+        """
+        with self._render_pool_lock:
+            if self._render_pool is None:
+                # Spawn rather than fork, as forking a process that is running
+                # download threads can deadlock the child
+                self._render_pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_render_worker,
+                    initargs=(self.output_dir,)
+                )
+            return self._render_pool
+    
+    def _get_pdf_path(self, page_info, relative_path):
+        """
+        Get the path a page's PDF is exported to
+        
+        Args:
+            page_info: Dictionary containing page information (id, title)
+            relative_path: Relative path for organizing output
+            
+        Returns:
+            str: PDF file path
+        """
         title = page_info.get('title', 'Untitled')
         page_id = page_info.get('id', 'unknown')
-        
-        # Create subdirectory if relative_path is provided
+        # Pages with a relative_path go in a subdirectory
         if relative_path:
-            safe_path = self._sanitize_path(relative_path)
-            output_subdir = os.path.join(self.output_dir, safe_path)
-            os.makedirs(output_subdir, exist_ok=True)
+            output_subdir = os.path.join(self.output_dir, self._sanitize_path(relative_path))
         else:
             output_subdir = self.output_dir
         
         filename = f"{self._sanitize_filename(title)}_{page_id}.pdf"
-        filepath = os.path.join(output_subdir, filename)
+        return os.path.join(output_subdir, filename)
+    
+    def _prepare_page(self, page_info, html_content, attachments, relative_path, confluence_client, owners,
+                      skip_existing=True):
+        """
+        Download a page's attachments and build its complete HTML document
         
-        # Check if PDF already exists
-        if os.path.exists(filepath):
+        Args:
+            page_info: Dictionary containing page information (id, title)
+            html_content: HTML content of the page
+            attachments: List of attachment dictionaries
+            relative_path: Relative path for organizing output
+            confluence_client: ConfluenceClient instance, or None
+            owners: List or string of page owners
+            skip_existing: Return None if the page's PDF already exists and is up to date
+            
+        Returns:
+            tuple: (filepath, full_html, sections, modified), or None if the PDF is
+                up to date. modified is the page version's timestamp, which is
+                given to the PDF as modification time
+        """
+        logger.debug(f"Exporting page ID {page_info.get('id')} - '{page_info.get('title')}'")
+        # Get page title and ID
+        title = page_info.get('title', 'Untitled')
+        page_id = page_info.get('id', 'unknown')
+        
+        # Skip the page if its PDF is already up to date
+        filepath = self._get_pdf_path(page_info, relative_path)
+        if skip_existing and self.is_up_to_date(page_info, relative_path):
             relative_output = os.path.relpath(filepath, self.output_dir)
             logger.info(f"⊘ Skipped (already exists): {relative_output}")
-            return
+            return None
+        
+        output_subdir = os.path.dirname(filepath)
+        self._ensure_dir(output_subdir)
+        modified = _version_timestamp(page_info)
+        
+        # Start fetching the version history now so the request overlaps with
+        # downloading attachments and building the HTML
+        version_future = None
+        if confluence_client:
+            logger.debug(f"Fetching version history...")
+            version_future = self._history_pool.submit(confluence_client.get_version_history, page_id)
         
         # Handle attachments if present
         attachments_folder_name = None
@@ -594,6 +1055,7 @@ class PDFExporter:
             # Download attachments
             logger.debug(f"Downloading {len(attachments)} attachment(s)...")
             video_extensions = ('.mp4', '.mov', '.avi', '.mkv', '.wmv', '.flv', '.webm', '.m4v', '.mpg', '.mpeg', '.3gp')
+            downloads = []
             for att in attachments:
                 att_filename = att.get('title', 'unknown')
                 
@@ -603,9 +1065,14 @@ class PDFExporter:
                     continue
                 
                 att_filepath = os.path.join(attachments_dir, att_filename)
-                
-                if confluence_client:
-                    if confluence_client.download_attachment(att, att_filepath):
+                downloads.append((att, att_filepath))
+            
+            if confluence_client and downloads:
+                # Transfer all attachments of the page in parallel
+                results = confluence_client.download_attachments(downloads)
+                for (att, _), success in zip(downloads, results):
+                    att_filename = att.get('title', 'unknown')
+                    if success:
                         logger.info(f"✓ Downloaded: {att_filename}")
                     else:
                         logger.warning(f"✗ Failed to download: {att_filename}")
@@ -613,6 +1080,9 @@ class PDFExporter:
         # Clean HTML content
         cleaned_content = self._clean_html(html_content)
         
+        # Optional sections included in the page, to pick their styles
+        sections = []
+        
         # Process and add contributors section if provided
         contributors_html = ""
         if owners:  # Parameter is named 'owners' but now contains contributors list
@@ -623,37 +1093,128 @@ class PDFExporter:
         # Prepend contributors section to content (after title, before main content)
         if contributors_html:
             cleaned_content = contributors_html + cleaned_content
+            sections.append('contributors')
         
         # Add attachments section to HTML if attachments exist
         if attachments and len(attachments) > 0:
             attachments_html = self._create_attachments_html(attachments, attachments_folder_name)
             cleaned_content += attachments_html
+            sections.append('attachments')
         
         # Add version history section if confluence_client is available
-        if confluence_client:
+        if version_future:
             try:
-                logger.debug(f"Fetching version history...")
-                versions = confluence_client.get_version_history(page_id)
+                versions = version_future.result(timeout=30)
                 if versions:
                     version_history_html = self._create_version_history_html(versions)
                     cleaned_content += version_history_html
+                    sections.append('version_history')
                     logger.debug(f"✓ Added {len(versions)} version(s) to history")
             except Exception as e:
-                logger.debug(f"Could not add version history: {str(e)}")
+                logger.warning(f"Could not add version history: {str(e)}")
+                # Leave the PDF's modification time alone, so the incomplete PDF
+                # isn't taken as up to date and is exported again next run
+                modified = None
         
         # Create complete HTML document
         full_html = self._create_html_template(title, cleaned_content)
         
+        return filepath, full_html, sections, modified
+    
+    def _write_pdf(self, filepath, full_html, sections, modified=None):
+        """
+        Render an HTML document to a PDF file
+        
+        Args:
+            filepath: Path of the PDF file
+            full_html: Complete HTML document
+            sections: Names of the optional sections included in the page
+            modified: Modification time to give the PDF, in seconds since the epoch (optional)
+        """
+        self._save_document(self._render_document(full_html, sections), filepath, modified)
+    
+    def _render_document(self, full_html, sections):
+        """
+        Lay out an HTML document
+        
+        Args:
+            full_html: Complete HTML document
+            sections: Names of the optional sections included in the page
+            
+        Returns:
+            Document: Rendered WeasyPrint document
+        """
+        return HTML(string=full_html).render(
+            stylesheets=self._get_stylesheets(sections),
+            font_config=self._get_font_config(),
+            cache=self._image_cache
+        )
+    
+    def _save_document(self, document, filepath, modified=None):
+        """
+        Write a rendered document to a PDF file
+        
+        Args:
+            document: Rendered WeasyPrint document
+            filepath: Path of the PDF file
+            modified: Modification time to give the PDF, in seconds since the epoch (optional)
+        """
+        # Stream the PDF through a large write buffer into a temporary file
+        # and only move it into place once complete, so an interrupted
+        # export never leaves a truncated PDF that later runs would skip
+        partial_filepath = filepath + '.part'
+        with open(partial_filepath, 'wb', buffering=1024 * 1024) as f:
+            document.write_pdf(f)
+        if modified is not None:
+            os.utime(partial_filepath, (modified, modified))
+        os.replace(partial_filepath, filepath)
+    
+    def _finish_page(self, filepath, full_html, render):
+        """
+        Render a prepared page and report the result
+        
+        Args:
+            filepath: Path of the PDF file
+            full_html: Complete HTML document
+            render: Callable that renders the PDF (or waits for it to be rendered)
+        """
         # Convert to PDF
         try:
-            HTML(string=full_html).write_pdf(filepath)
+            render()
             relative_output = os.path.relpath(filepath, self.output_dir)
-                        # Save HTML for debugging if PDF generation fails
+            # Save HTML for debugging if PDF generation fails
             html_filepath = filepath.replace('.pdf', '.html')
             with open(html_filepath, 'w', encoding='utf-8') as f:
                 f.write(full_html)
             logger.debug(f"→ HTML saved for debugging: {html_filepath}")
             logger.debug(f"✓ Saved: {relative_output}")
         except Exception as e:
-            logger.error(f"✗ Error saving {filename}: {str(e)}")
+            logger.error(f"✗ Error saving {os.path.basename(filepath)}: {str(e)}")
+
+
+# Exporter rendering PDFs inside a worker process of a PDFExporter render pool
+_worker_exporter = None
 
+
+def _init_render_worker(output_dir):
+    """
+    Set up a rendering worker process
+    
+    Args:
+        output_dir: Output directory of the exporter owning the pool
+    """
+    global _worker_exporter
+    _worker_exporter = PDFExporter(output_dir)
+
+
+def _render_in_worker(filepath, full_html, sections, modified=None):
+    """
+    Render an HTML document to a PDF file in a worker process
+    
+    Args:
+        filepath: Path of the PDF file
+        full_html: Complete HTML document
+        sections: Names of the optional sections included in the page
+        modified: Modification time to give the PDF, in seconds since the epoch (optional)
+    """
+    _worker_exporter._write_pdf(filepath, full_html, sections, modified)